@@ -1,39 +1,637 @@
 import os
 import sys
+import gzip
 import json
+import argparse
+import time
+import errno
+import ipaddress
+import select
+import socket
+import stat
+import tempfile
+import threading
 import keyring
 import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                               QHBoxLayout, QLabel, QPushButton, QSpinBox, 
                               QDialog, QLineEdit, QMessageBox, QCheckBox, 
                               QComboBox, QSystemTrayIcon, QMenu, QTableWidget,
                               QTableWidgetItem, QHeaderView)
-from PySide6.QtCore import QTimer, Qt
+from PySide6.QtCore import QTimer, Qt, Signal
 from PySide6.QtGui import QIcon, QAction, QColor, QBrush
 from aliyunsdkcore.auth.credentials import AccessKeyCredential
 from aliyunsdkcore.client import AcsClient
+from aliyunsdkcore.acs_exception.exceptions import ServerException, ClientException
 from aliyunsdkecs.request.v20140526.AuthorizeSecurityGroupRequest import AuthorizeSecurityGroupRequest
 from aliyunsdkecs.request.v20140526.RevokeSecurityGroupRequest import RevokeSecurityGroupRequest
 from aliyunsdkecs.request.v20140526.DescribeSecurityGroupsRequest import DescribeSecurityGroupsRequest
 from aliyunsdkecs.request.v20140526.DescribeSecurityGroupAttributeRequest import DescribeSecurityGroupAttributeRequest
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # 非 POSIX 系统上不做跨进程加锁，仅按有效期复用缓存
+
 def resource_path(relative_path):
     """获取资源的绝对路径，支持开发环境和打包后的环境"""
     if hasattr(sys, '_MEIPASS'):
         return os.path.join(sys._MEIPASS, relative_path)
     return os.path.join(os.path.abspath("."), relative_path)
 
+KEYRING_SERVICE = "network_updater"
+DEFAULT_PROFILE = "default"
+
+def profile_key(profile_name, key):
+    """获取配置在密钥库中的键名，默认配置沿用原有键名以兼容已保存的凭证"""
+    if profile_name == DEFAULT_PROFILE:
+        return key
+    return f"{key}:{profile_name}"
+
+def load_profile_names():
+    """读取所有配置名称，未保存过时只有默认配置"""
+    names = keyring.get_password(KEYRING_SERVICE, "profiles")
+    names = json.loads(names) if names else []
+    if DEFAULT_PROFILE not in names:
+        names.insert(0, DEFAULT_PROFILE)
+    return names
+
+def save_profile_names(names):
+    keyring.set_password(KEYRING_SERVICE, "profiles", json.dumps(names))
+
+def is_throttled(error):
+    """判断异常是否为阿里云API限流"""
+    return (isinstance(error, ServerException)
+            and str(error.get_error_code()).startswith('Throttling'))
+
+class Profile:
+    """单个阿里云账号配置，持有独立的客户端和规则状态
+
+    除 UI 外的阿里云 API 调用都在这里完成，可以在工作线程中并发执行。
+    """
+    def __init__(self, name, recorder=None):
+        self.name = name
+        self.client = None
+        self.recorder = recorder
+        self.current_rule = None
+        self.security_groups = []
+        self.security_group_id = None
+        self.port = 8223
+        self.probe_host = ''
+        self.authorized_at = None
+        self.revoke_error = None
+        self.auto_delete = True
+        self.auto_update = True
+        self.stats = {
+            'syncs': 0,
+            'failures': 0,
+            'throttled': 0,
+            'revoke_failures': 0,
+            'last_sync_ms': None,
+            'probe_failures': 0,
+            'last_open_ms': None
+        }
+
+    def load_settings(self, settings):
+        self.auto_delete = settings.get('auto_delete', True)
+        self.auto_update = settings.get('auto_update', True)
+        self.port = settings.get('port', 8223)
+        self.security_group_id = settings.get('security_group_id')
+        self.probe_host = settings.get('probe_host', '')
+
+    def to_settings(self):
+        return {
+            'auto_delete': self.auto_delete,
+            'auto_update': self.auto_update,
+            'port': self.port,
+            'security_group_id': self.security_group_id,
+            'probe_host': self.probe_host
+        }
+
+    def init_client(self):
+        credentials = keyring.get_password(KEYRING_SERVICE, profile_key(self.name, "credentials"))
+        secret = keyring.get_password(KEYRING_SERVICE, profile_key(self.name, "access_secret"))
+        
+        if credentials and secret:
+            cred_dict = json.loads(credentials)
+            credentials = AccessKeyCredential(cred_dict['access_key'], secret)
+            self.client = AcsClient(region_id=cred_dict['region_id'], 
+                                  credential=credentials)
+
+    def do_action(self, request):
+        if self.recorder:
+            return self.recorder.call(self.name, self.client, request)
+        return self.client.do_action_with_exception(request)
+
+    def fetch_security_groups(self):
+        request = DescribeSecurityGroupsRequest()
+        request.set_accept_format('json')
+        response = json.loads(self.do_action(request))
+        self.security_groups = response.get('SecurityGroups', {}).get('SecurityGroup', [])
+        return self.security_groups
+
+    def fetch_rules(self, security_group_id):
+        request = DescribeSecurityGroupAttributeRequest()
+        request.set_accept_format('json')
+        request.set_SecurityGroupId(security_group_id)
+        
+        response = json.loads(self.do_action(request))
+        return response.get('Permissions', {}).get('Permission', [])
+
+    def authorize(self, current_ip):
+        request = AuthorizeSecurityGroupRequest()
+        request.set_accept_format('json')
+        request.set_SecurityGroupId(self.security_group_id)
+        request.set_IpProtocol("tcp")
+        request.set_PortRange(f"{self.port}/{self.port}")
+        request.set_SourceCidrIp(f"{current_ip}/32")
+        request.set_Description("由 NetworkUpdater 添加")
+        
+        self.do_action(request)
+        self.authorized_at = time.monotonic()
+        self.current_rule = {
+            'ip': current_ip,
+            'port': self.port,
+            'security_group_id': self.security_group_id
+        }
+
+    def revoke(self):
+        if not self.current_rule:
+            return
+            
+        request = RevokeSecurityGroupRequest()
+        request.set_accept_format('json')
+        request.set_SecurityGroupId(self.current_rule['security_group_id'])
+        request.set_IpProtocol("tcp")
+        request.set_PortRange(f"{self.current_rule['port']}/{self.current_rule['port']}")
+        request.set_SourceCidrIp(f"{self.current_rule['ip']}/32")
+        
+        self.do_action(request)
+        self.current_rule = None
+
+    def sync(self, current_ip):
+        """用新的IP替换旧规则，失败和限流次数计入统计
+
+        撤销旧规则失败时记录到 revoke_error，仍然继续添加新规则。
+        """
+        start = time.monotonic()
+        self.stats['syncs'] += 1
+        self.revoke_error = None
+        try:
+            # 如果存在旧规则，先删除
+            try:
+                self.revoke()
+            except Exception as e:
+                self.revoke_error = e
+                self.stats['revoke_failures'] += 1
+                if is_throttled(e):
+                    self.stats['throttled'] += 1
+            self.authorize(current_ip)
+        except Exception as e:
+            self.stats['failures'] += 1
+            if is_throttled(e):
+                self.stats['throttled'] += 1
+            raise
+        finally:
+            self.stats['last_sync_ms'] = int((time.monotonic() - start) * 1000)
+
+def is_valid_ip(ip):
+    try:
+        # 只接受标准写法的IPv4地址，拒绝前导零、空白和非ASCII数字
+        return str(ipaddress.IPv4Address(ip)) == ip
+    except ValueError:
+        return False
+
+def resolve_public_ip(http_get=None):
+    """依次尝试各IP检测接口，全部失败时返回 None
+
+    http_get 用于替换 requests.get，录制和回放时传入。
+    """
+    http_get = http_get or requests.get
+    # IP检测接口列表，按优先级排序
+    ip_apis = [
+        {
+            'url': 'https://myip.ipip.net/json',
+            'parser': lambda r: r.json()['data']['ip']
+        },
+        {
+            'url': 'https://myip.ipip.net/',
+            'parser': lambda r: r.text.split('IP：')[1].split(' ')[0]
+        },
+        {
+            'url': 'http://ip.3322.net',
+            'parser': lambda r: r.text.strip()
+        },
+        {
+            'url': 'https://api.ipify.org?format=json',
+            'parser': lambda r: r.json()['ip']
+        }
+    ]
+
+    for api in ip_apis:
+        try:
+            response = http_get(api['url'], timeout=5)
+            if response.status_code == 200:
+                ip = api['parser'](response)
+                if ip and is_valid_ip(ip):
+                    return ip
+        except Exception:
+            continue
+    return None
+
+PROBE_TIMEOUT = 60  # 秒，规则生效检测的最长等待时间
+PROBE_CONNECT_TIMEOUT = 2  # 秒，单次连接尝试的等待时间
+
+def probe_port(host, port, timeout=PROBE_TIMEOUT, initial_delay=0.25, max_delay=8):
+    """反复尝试连接端口直到成功或超时，返回端口是否可访问
+
+    每次使用非阻塞 connect 并通过 select 等待结果，失败后按指数退避重试。
+    主机名无法解析时抛出 socket.gaierror。
+    """
+    deadline = time.monotonic() + timeout
+    delay = initial_delay
+    # 规则只放行IPv4地址，因此只通过IPv4检测
+    family, sock_type, proto, _, address = socket.getaddrinfo(
+        host, port, family=socket.AF_INET, type=socket.SOCK_STREAM)[0]
+        
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+            
+        with socket.socket(family, sock_type, proto) as sock:
+            sock.setblocking(False)
+            result = sock.connect_ex(address)
+            if result == 0:
+                return True
+            if result in (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN):
+                _, writable, _ = select.select([], [sock], [], min(remaining, PROBE_CONNECT_TIMEOUT))
+                if writable and sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                    return True
+                    
+        time.sleep(max(0, min(delay, deadline - time.monotonic())))
+        delay = min(delay * 2, max_delay)
+
+def default_ip_cache_path():
+    # Linux 上临时目录是所有用户共用的 /tmp，需要放在按用户区分的子目录中
+    if hasattr(os, 'getuid'):
+        directory = os.path.join(tempfile.gettempdir(), f"network_updater-{os.getuid()}")
+    else:
+        directory = tempfile.gettempdir()  # Windows 的临时目录本身按用户区分
+    return os.path.join(directory, "network_updater_ip.json")
+
+IP_CACHE_PATH = default_ip_cache_path()
+IP_CACHE_TTL = 240  # 秒，略小于5分钟的检查间隔
+IP_CACHE_WAIT = 5  # 秒，等待其他实例查询的最长时间，等待期间界面无响应
+
+class SharedIpCache:
+    """本机共享的公网IP缓存
+
+    同一用户下的所有实例通过缓存文件复用最近一次查询结果。缓存过期时由
+    拿到文件锁的实例负责查询并写回，其余实例等锁释放后直接读取新结果，
+    这样每个检查周期只向外部接口查询一次。
+
+    缓存目录必须只有当前用户可以访问，否则不使用缓存，避免其他用户写入
+    伪造的IP被添加到安全组中。
+    """
+    def __init__(self, path=IP_CACHE_PATH, ttl=IP_CACHE_TTL, wait_timeout=IP_CACHE_WAIT):
+        self.path = path
+        self.lock_path = path + ".lock"
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+
+    def prepare_directory(self):
+        """创建缓存目录，返回目录是否只有当前用户可以访问"""
+        directory = os.path.dirname(self.path)
+        try:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            info = os.lstat(directory)
+        except OSError:
+            return False
+        if not hasattr(os, 'getuid'):
+            return True
+        return (stat.S_ISDIR(info.st_mode) and info.st_uid == os.getuid()
+                and not info.st_mode & 0o077)
+
+    def read(self):
+        """返回未过期的缓存IP，没有或内容无效时返回 None"""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            age = time.time() - data['timestamp']
+            # 时间戳在未来的缓存同样视为无效
+            if 0 <= age < self.ttl and is_valid_ip(data['ip']):
+                return data['ip']
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        return None
+
+    def write(self, ip):
+        # 先写临时文件再替换，读取方不会看到写了一半的内容
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'ip': ip, 'timestamp': time.time()}, f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, resolver, refresh=False):
+        """读取缓存IP，缓存过期时调用 resolver 查询并写回
+
+        refresh 为 True 时忽略缓存，直接查询并写回，用于手动更新。
+        resolver 在持有文件锁时调用，不能弹出对话框等待用户操作。
+        """
+        if not self.prepare_directory():
+            return resolver()
+            
+        ip = None if refresh else self.read()
+        if ip:
+            return ip
+        if fcntl is None:
+            return self.resolve(resolver)
+            
+        try:
+            lock_file = open(self.lock_path, 'a')
+        except OSError:
+            return self.resolve(resolver)
+            
+        with lock_file:
+            deadline = time.monotonic() + self.wait_timeout
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    # 其他实例正在查询，超时后不再等待，自行查询
+                    if time.monotonic() >= deadline:
+                        return self.resolve(resolver)
+                    time.sleep(0.1)
+            try:
+                # 等锁期间其他实例可能已经刷新了缓存
+                ip = None if refresh else self.read()
+                return ip or self.resolve(resolver)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def resolve(self, resolver):
+        ip = resolver()
+        if ip:
+            try:
+                self.write(ip)
+            except OSError:
+                pass  # 缓存写入失败不影响本次更新
+        return ip
+
+def sync_concurrently(profiles, current_ip):
+    """每个配置使用自己的客户端在独立线程中更新规则，互不影响
+
+    返回 (配置, 异常) 列表，成功时异常为 None。
+    """
+    with ThreadPoolExecutor(max_workers=len(profiles)) as executor:
+        futures = [(p, executor.submit(p.sync, current_ip)) for p in profiles]
+        
+    results = []
+    for profile, future in futures:
+        try:
+            future.result()
+            results.append((profile, None))
+        except Exception as e:
+            results.append((profile, e))
+    return results
+
+def dump_error(error):
+    if isinstance(error, ServerException):
+        return {'type': 'server', 'code': error.get_error_code(), 'message': error.get_error_msg(),
+                'http_status': error.get_http_status(), 'request_id': error.get_request_id()}
+    if isinstance(error, ClientException):
+        return {'type': 'client', 'code': error.get_error_code(), 'message': error.get_error_msg()}
+    return {'type': 'other', 'message': str(error)}
+
+def load_error(data):
+    if data['type'] == 'server':
+        return ServerException(data['code'], data['message'], data['http_status'], data['request_id'])
+    if data['type'] == 'client':
+        return ClientException(data['code'], data['message'])
+    return Exception(data['message'])
+
+class TrafficRecorder:
+    """将阿里云API和IP检测接口的请求、响应及耗时记录到 gzip 压缩的 JSON Lines 文件
+
+    每行一个事件，t 为相对录制开始的秒数，elapsed 为请求耗时。每个事件单独
+    压缩为一个 gzip 成员，程序异常退出时已写入的事件仍然可以读取。
+    """
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.lock = threading.Lock()
+        self.start = time.monotonic()
+
+    def write(self, event):
+        line = json.dumps(event, ensure_ascii=False, separators=(',', ':'))
+        data = gzip.compress((line + '\n').encode('utf-8'))
+        # 各配置在不同线程中同时调用，写入时加锁
+        with self.lock:
+            if not self.file.closed:
+                self.file.write(data)
+                self.file.flush()
+
+    def call(self, profile_name, client, request):
+        start = time.monotonic()
+        event = {
+            'kind': 'sdk',
+            'profile': profile_name,
+            'action': request.get_action_name(),
+            'params': request.get_query_params(),
+            't': round(start - self.start, 4)
+        }
+        try:
+            response = client.do_action_with_exception(request)
+            event['response'] = response.decode('utf-8') if isinstance(response, bytes) else response
+            return response
+        except Exception as e:
+            event['error'] = dump_error(e)
+            raise
+        finally:
+            event['elapsed'] = round(time.monotonic() - start, 4)
+            self.write(event)
+
+    def http_get(self, url, timeout):
+        start = time.monotonic()
+        event = {'kind': 'ip', 'url': url, 't': round(start - self.start, 4)}
+        try:
+            response = requests.get(url, timeout=timeout)
+            event['status_code'] = response.status_code
+            event['text'] = response.text
+            return response
+        except Exception as e:
+            event['error'] = str(e)
+            raise
+        finally:
+            event['elapsed'] = round(time.monotonic() - start, 4)
+            self.write(event)
+
+    def record_probe(self, profile_name, host, port, seconds, error):
+        """记录端口检测结果，seconds 为规则生效耗时，未连通时为 None"""
+        self.write({
+            'kind': 'probe',
+            't': round(time.monotonic() - self.start, 4),
+            'profile': profile_name,
+            'host': host,
+            'port': port,
+            'seconds': None if seconds is None else round(seconds, 4),
+            'error': error
+        })
+
+    def record_sync(self, start, current_ip, profiles):
+        """记录一次同步及各配置同步前的状态，回放时据此重建配置"""
+        self.write({
+            'kind': 'sync',
+            't': round(start - self.start, 4),
+            'ip': current_ip,
+            'profiles': [{
+                'name': p.name,
+                'security_group_id': p.security_group_id,
+                'port': p.port,
+                'current_rule': p.current_rule
+            } for p in profiles]
+        })
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+class ReplayError(Exception):
+    """录制文件中没有可回放的响应"""
+
+class RecordedResponse:
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.text = text
+
+    def json(self):
+        return json.loads(self.text)
+
+class ReplayClient:
+    """按录制顺序返回某个配置的SDK响应，并按回放倍速模拟请求耗时"""
+    def __init__(self, speed):
+        self.speed = speed
+        self.queues = {}
+
+    def add(self, event):
+        self.queues.setdefault(event['action'], deque()).append(event)
+
+    def do_action_with_exception(self, request):
+        action = request.get_action_name()
+        queue = self.queues.get(action)
+        if not queue:
+            raise ReplayError(f"录制文件中没有更多 {action} 响应")
+        event = queue.popleft()
+        replay_sleep(event['elapsed'], self.speed)
+        if 'error' in event:
+            raise load_error(event['error'])
+        return event['response'].encode('utf-8')
+
+def replay_sleep(seconds, speed):
+    # speed 为 0 时不等待，尽快回放
+    if speed > 0 and seconds > 0:
+        time.sleep(seconds / speed)
+
+def replay_traffic(path, speed=1.0, output=print):
+    """不启动界面，按录制文件回放每次同步，返回每次同步的耗时（秒）"""
+    events = []
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        try:
+            for line in f:
+                if line.strip():
+                    events.append(json.loads(line))
+        except (EOFError, OSError, ValueError):
+            # 录制时程序异常退出，最后一个事件不完整
+            output(f"录制文件不完整，回放前 {len(events)} 个事件")
+            
+    clients = {}
+    ticks = []
+    ip_events = []
+    for event in events:
+        if event['kind'] == 'sdk':
+            clients.setdefault(event['profile'], ReplayClient(speed)).add(event)
+        elif event['kind'] == 'ip':
+            ip_events.append(event)
+        elif event['kind'] == 'sync':
+            # 同步前的IP检测请求属于这次同步，没有时说明使用了缓存
+            ticks.append((event, ip_events))
+            ip_events = []
+            
+    def http_get(queue):
+        def get(url, timeout):
+            if not queue:
+                raise ReplayError(f"录制文件中没有更多 {url} 响应")
+            event = queue.popleft()
+            replay_sleep(event['elapsed'], speed)
+            if 'error' in event:
+                raise Exception(event['error'])
+            return RecordedResponse(event['status_code'], event['text'])
+        return get
+        
+    profiles = {}
+    durations = []
+    replay_start = time.monotonic()
+    for i, (tick, tick_ip_events) in enumerate(ticks, 1):
+        replay_sleep(tick['t'] - (time.monotonic() - replay_start) * speed, speed)
+        tick_start = time.monotonic()
+        
+        current_ip = tick['ip']
+        if tick_ip_events:
+            current_ip = resolve_public_ip(http_get(deque(tick_ip_events)))
+        if not current_ip:
+            durations.append(time.monotonic() - tick_start)
+            output(f"第 {i} 次同步: 获取公网IP失败")
+            continue
+            
+        targets = []
+        for state in tick['profiles']:
+            profile = profiles.get(state['name'])
+            if not profile:
+                profile = profiles[state['name']] = Profile(state['name'])
+                profile.client = clients.get(state['name'], ReplayClient(speed))
+            profile.security_group_id = state['security_group_id']
+            profile.port = state['port']
+            profile.current_rule = state['current_rule']
+            targets.append(profile)
+            
+        results = sync_concurrently(targets, current_ip)
+        duration = time.monotonic() - tick_start
+        durations.append(duration)
+        output(f"第 {i} 次同步: IP {current_ip}，耗时 {duration * 1000:.0f} ms")
+        for profile, e in results:
+            status = "成功" if e is None else f"失败: {str(e)}"
+            if profile.revoke_error:
+                status += f"（撤销旧规则失败: {str(profile.revoke_error)}）"
+            output(f"  [{profile.name}] {profile.stats['last_sync_ms']} ms {status}")
+    return durations
+
 class ConfigDialog(QDialog):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, profile_name=DEFAULT_PROFILE):
         super().__init__(parent)
+        # profile_name 为 None 时表示新建配置
+        self.profile_name = profile_name
         self.setWindowTitle("凭证配置")
         self.setModal(True)
         self.init_ui()
-        self.load_credentials()
+        if profile_name:
+            self.load_credentials()
 
     def init_ui(self):
         layout = QVBoxLayout()
         
+        # 配置名称
+        name_layout = QHBoxLayout()
+        name_layout.addWidget(QLabel("配置名称:"))
+        self.name_input = QLineEdit()
+        if self.profile_name:
+            self.name_input.setText(self.profile_name)
+            self.name_input.setReadOnly(True)
+        name_layout.addWidget(self.name_input)
+        layout.addLayout(name_layout)
+        
         # Access Key配置
         key_layout = QHBoxLayout()
         key_layout.addWidget(QLabel("Access Key:"))
@@ -66,28 +664,42 @@ class ConfigDialog(QDialog):
 
     def load_credentials(self):
         try:
-            credentials = keyring.get_password("network_updater", "credentials")
+            credentials = keyring.get_password(KEYRING_SERVICE, profile_key(self.profile_name, "credentials"))
             if credentials:
                 cred_dict = json.loads(credentials)
                 self.key_input.setText(cred_dict['access_key'])
                 self.region_input.setText(cred_dict['region_id'])
                 
-                secret = keyring.get_password("network_updater", "access_secret")
+                secret = keyring.get_password(KEYRING_SERVICE, profile_key(self.profile_name, "access_secret"))
                 if secret:
                     self.secret_input.setText(secret)
         except Exception as e:
             QMessageBox.warning(self, "警告", f"加载保存的凭证失败: {str(e)}")
 
     def save_credentials(self):
+        name = self.name_input.text().strip()
+        if not name:
+            QMessageBox.warning(self, "警告", "请输入配置名称")
+            return
+            
         try:
+            names = load_profile_names()
+            if self.profile_name is None and name in names:
+                QMessageBox.warning(self, "警告", f"配置 {name} 已存在")
+                return
+                
             credentials = {
                 'access_key': self.key_input.text(),
                 'region_id': self.region_input.text()
             }
-            keyring.set_password("network_updater", "credentials", 
+            keyring.set_password(KEYRING_SERVICE, profile_key(name, "credentials"), 
                                json.dumps(credentials))
-            keyring.set_password("network_updater", "access_secret", 
+            keyring.set_password(KEYRING_SERVICE, profile_key(name, "access_secret"), 
                                self.secret_input.text())
+            if name not in names:
+                names.append(name)
+                save_profile_names(names)
+            self.profile_name = name
             
             QMessageBox.information(self, "成功", "凭证保存成功！")
             self.accept()
@@ -96,16 +708,25 @@ class ConfigDialog(QDialog):
             QMessageBox.critical(self, "错误", f"保存凭证失败: {str(e)}")
 
 class NetworkUpdater(QMainWindow):
-    def __init__(self):
+    # 端口检测完成：配置名称，对应的授权时间，规则生效耗时（秒，未连通时为 None），错误信息
+    probe_finished = Signal(str, float, object, str)
+
+    def __init__(self, recorder=None):
         super().__init__()
         self.setWindowTitle("安全组更新器")
         self.setGeometry(100, 100, 400, 300)
         
-        # 存储当前规则的ID
-        self.current_rule = None
-        self.client = None
-        self.auto_delete = True  # 默认启用自动删除
-        self.auto_update = True  # 默认启用自动更新
+        # 开启录制时记录所有阿里云API和IP检测接口的请求
+        self.recorder = recorder
+        
+        # 每个配置持有独立的客户端和当前规则
+        try:
+            profile_names = load_profile_names()
+        except Exception:
+            profile_names = [DEFAULT_PROFILE]  # 读取失败时只使用默认配置
+        self.profiles = {name: Profile(name, recorder) for name in profile_names}
+        self.active_profile = profile_names[0]
+        self.ip_cache = SharedIpCache()
         
         # 初始化系统托盘
         self.tray_icon = None
@@ -113,6 +734,7 @@ class NetworkUpdater(QMainWindow):
         
         # 初始化UI和其他组件
         self.init_ui()
+        self.populate_profiles()
         self.load_settings()
         self.init_client()
         
@@ -121,8 +743,47 @@ class NetworkUpdater(QMainWindow):
         self.timer.timeout.connect(self.update_security_group)
         self.timer.start(300000)  # 300000ms = 5分钟
         
+        self.probe_finished.connect(self.on_probe_finished)
+        
         # 程序退出时清理规则
-        app.aboutToQuit.connect(self.cleanup)
+        QApplication.instance().aboutToQuit.connect(self.cleanup)
+
+    @property
+    def profile(self):
+        """当前界面正在编辑的配置"""
+        return self.profiles[self.active_profile]
+
+    @property
+    def client(self):
+        return self.profile.client
+
+    @client.setter
+    def client(self, client):
+        self.profile.client = client
+
+    @property
+    def current_rule(self):
+        return self.profile.current_rule
+
+    @current_rule.setter
+    def current_rule(self, rule):
+        self.profile.current_rule = rule
+
+    @property
+    def auto_delete(self):
+        return self.profile.auto_delete
+
+    @auto_delete.setter
+    def auto_delete(self, value):
+        self.profile.auto_delete = value
+
+    @property
+    def auto_update(self):
+        return self.profile.auto_update
+
+    @auto_update.setter
+    def auto_update(self, value):
+        self.profile.auto_update = value
 
     def setup_tray(self):
         # 创建系统托盘图标
@@ -148,7 +809,7 @@ class NetworkUpdater(QMainWindow):
         
         # 立即更新
         update_action = QAction("立即更新", self)
-        update_action.triggered.connect(self.update_security_group)
+        update_action.triggered.connect(self.force_update_security_group)
         tray_menu.addAction(update_action)
         
         # 分隔线
@@ -190,7 +851,7 @@ class NetworkUpdater(QMainWindow):
 
     def quit_application(self):
         # 真正的退出程序
-        if self.current_rule and self.auto_delete:
+        if any(p.current_rule and p.auto_delete for p in self.profiles.values()):
             reply = QMessageBox.question(
                 None, 
                 "确认退出",
@@ -216,6 +877,21 @@ class NetworkUpdater(QMainWindow):
         self.setCentralWidget(central_widget)
         layout = QVBoxLayout()
         
+        # 配置选择
+        profile_layout = QHBoxLayout()
+        profile_layout.addWidget(QLabel("配置:"))
+        self.profile_combo = QComboBox()
+        self.profile_combo.setMinimumWidth(250)
+        self.profile_combo.currentIndexChanged.connect(self.on_profile_changed)
+        profile_layout.addWidget(self.profile_combo)
+        self.new_profile_btn = QPushButton("新建")
+        self.new_profile_btn.clicked.connect(self.show_new_profile_dialog)
+        profile_layout.addWidget(self.new_profile_btn)
+        self.delete_profile_btn = QPushButton("删除")
+        self.delete_profile_btn.clicked.connect(self.delete_profile)
+        profile_layout.addWidget(self.delete_profile_btn)
+        layout.addLayout(profile_layout)
+        
         # 安全组选择
         sg_layout = QHBoxLayout()
         sg_layout.addWidget(QLabel("安全组:"))
@@ -236,6 +912,15 @@ class NetworkUpdater(QMainWindow):
         port_layout.addWidget(self.port_input)
         layout.addLayout(port_layout)
         
+        # 规则生效检测
+        probe_layout = QHBoxLayout()
+        probe_layout.addWidget(QLabel("检测主机:"))
+        self.probe_host_input = QLineEdit()
+        self.probe_host_input.setPlaceholderText("ECS 实例地址，更新后检测端口是否可访问，留空不检测")
+        self.probe_host_input.editingFinished.connect(self.save_settings)
+        probe_layout.addWidget(self.probe_host_input)
+        layout.addLayout(probe_layout)
+        
         # 自动删除选项
         self.auto_delete_cb = QCheckBox("退出时自动删除规则")
         self.auto_delete_cb.setChecked(True)
@@ -253,7 +938,7 @@ class NetworkUpdater(QMainWindow):
         self.config_btn = QPushButton("配置凭证")
         self.config_btn.clicked.connect(self.show_config_dialog)
         self.update_btn = QPushButton("立即更新")
-        self.update_btn.clicked.connect(self.update_security_group)
+        self.update_btn.clicked.connect(self.force_update_security_group)
         button_layout.addWidget(self.config_btn)
         button_layout.addWidget(self.update_btn)
         layout.addLayout(button_layout)
@@ -262,6 +947,10 @@ class NetworkUpdater(QMainWindow):
         self.status_label = QLabel("状态: 就绪")
         layout.addWidget(self.status_label)
         
+        # 当前配置的同步统计
+        self.stats_label = QLabel()
+        layout.addWidget(self.stats_label)
+        
         # 添加策略列表
         rules_label = QLabel("安全组规则列表")
         rules_label.setStyleSheet("font-weight: bold; margin-top: 10px;")
@@ -313,52 +1002,122 @@ class NetworkUpdater(QMainWindow):
         self.auto_update = bool(state)
         self.save_settings()
 
+    def populate_profiles(self):
+        self.profile_combo.blockSignals(True)
+        self.profile_combo.clear()
+        for name in self.profiles:
+            self.profile_combo.addItem(name)
+        self.profile_combo.setCurrentText(self.active_profile)
+        self.profile_combo.blockSignals(False)
+
+    def apply_profile(self):
+        """将当前配置的设置显示到界面上，不触发保存"""
+        profile = self.profile
+        self.port_input.setValue(profile.port)
+        self.probe_host_input.setText(profile.probe_host)
+        self.populate_security_groups()
+        for checkbox, checked in ((self.auto_delete_cb, profile.auto_delete),
+                                  (self.auto_update_cb, profile.auto_update)):
+            checkbox.blockSignals(True)
+            checkbox.setChecked(checked)
+            checkbox.blockSignals(False)
+        self.update_stats()
+
+    def update_stats(self):
+        stats = self.profile.stats
+        text = (f"统计: 同步 {stats['syncs']} 次，失败 {stats['failures']} 次，"
+                f"限流 {stats['throttled']} 次，撤销失败 {stats['revoke_failures']} 次")
+        if stats['last_sync_ms'] is not None:
+            text += f"，上次同步耗时 {stats['last_sync_ms']} ms"
+        if self.profile.probe_host:
+            text += f"，端口检测失败 {stats['probe_failures']} 次"
+            if stats['last_open_ms'] is not None:
+                text += f"，上次规则生效耗时 {stats['last_open_ms']} ms"
+        self.stats_label.setText(text)
+
+    def on_profile_changed(self, index):
+        name = self.profile_combo.itemText(index)
+        if not name or name == self.active_profile:
+            return
+            
+        # 切换前保存当前配置在界面上的选择
+        self.save_settings()
+        self.active_profile = name
+        self.rules_table.setRowCount(0)
+        if self.client and not self.profile.security_groups:
+            try:
+                self.profile.fetch_security_groups()
+            except Exception as e:
+                self.update_status(f"获取安全组列表失败: {str(e)}")
+        self.apply_profile()
+        self.refresh_security_rules()
+
+    def profile_message(self, profile, message):
+        # 存在多个配置时在消息前标注配置名称
+        if len(self.profiles) > 1:
+            return f"[{profile.name}] {message}"
+        return message
+
     def init_client(self):
-        try:
-            credentials = keyring.get_password("network_updater", "credentials")
-            secret = keyring.get_password("network_updater", "access_secret")
+        errors = []
+        for profile in self.profiles.values():
+            try:
+                profile.init_client()
+            except Exception as e:
+                errors.append(self.profile_message(profile, str(e)))
+        if errors:
+            QMessageBox.critical(self, "错误", "初始化客户端失败: " + "\n".join(errors))
             
-            if credentials and secret:
-                cred_dict = json.loads(credentials)
-                credentials = AccessKeyCredential(cred_dict['access_key'], secret)
-                self.client = AcsClient(region_id=cred_dict['region_id'], 
-                                      credential=credentials)
-                # 初始化客户端后自动刷新安全组列表
-                self.refresh_security_groups()
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"初始化客户端失败: {str(e)}")
+        # 初始化客户端后自动刷新安全组列表
+        if self.client:
+            self.load_security_groups()
+        # 所有启用自动更新的配置共用一次公网IP查询
+        self.save_settings()
+        profiles = [p for p in self.profiles.values()
+                    if p.client and p.auto_update and p.security_group_id]
+        if profiles:
+            self.sync_profiles(profiles, refresh_ip=True)
 
-    def refresh_security_groups(self):
+    def load_security_groups(self):
+        """获取当前配置的安全组列表，成功时返回 True"""
         if not self.client:
             self.update_status("请先配置凭证")
             QMessageBox.warning(self, "警告", "请先配置凭证")
-            return
+            return False
 
         try:
-            request = DescribeSecurityGroupsRequest()
-            request.set_accept_format('json')
-            response = json.loads(self.client.do_action_with_exception(request))
-            
-            self.sg_combo.clear()
-            for sg in response.get('SecurityGroups', {}).get('SecurityGroup', []):
-                # 显示格式：SecurityGroupName (SecurityGroupId)
-                display_text = f"{sg.get('SecurityGroupName', '未命名')} ({sg.get('SecurityGroupId', '')})"
-                self.sg_combo.addItem(display_text, sg.get('SecurityGroupId'))
+            self.profile.fetch_security_groups()
+            self.populate_security_groups()
                 
             if self.sg_combo.count() > 0:
                 self.update_status("已成功加载安全组列表")
                 # 加载当前选中安全组的规则
                 self.refresh_security_rules()
-                # 如果启用了自动更新且成功获取到安全组列表，执行更新
-                if self.auto_update:
-                    self.update_security_group()
-            else:
-                self.update_status("未找到安全组")
+                return True
+            self.update_status("未找到安全组")
                 
         except Exception as e:
             error_message = f"获取安全组列表失败: {str(e)}"
             self.update_status(error_message)
             QMessageBox.critical(self, "错误", error_message)
+        return False
+
+    def refresh_security_groups(self):
+        # 如果启用了自动更新且成功获取到安全组列表，执行更新
+        if self.load_security_groups() and self.auto_update:
+            self.sync_profiles([self.profile], refresh_ip=True)
+
+    def populate_security_groups(self):
+        self.sg_combo.clear()
+        for sg in self.profile.security_groups:
+            # 显示格式：SecurityGroupName (SecurityGroupId)
+            display_text = f"{sg.get('SecurityGroupName', '未命名')} ({sg.get('SecurityGroupId', '')})"
+            self.sg_combo.addItem(display_text, sg.get('SecurityGroupId'))
+            
+        # 恢复该配置上次选择的安全组
+        index = self.sg_combo.findData(self.profile.security_group_id)
+        if index >= 0:
+            self.sg_combo.setCurrentIndex(index)
 
     def refresh_security_rules(self):
         """刷新当前安全组的规则列表"""
@@ -370,12 +1129,7 @@ class NetworkUpdater(QMainWindow):
             return
             
         try:
-            request = DescribeSecurityGroupAttributeRequest()
-            request.set_accept_format('json')
-            request.set_SecurityGroupId(security_group_id)
-            
-            response = json.loads(self.client.do_action_with_exception(request))
-            permissions = response.get('Permissions', {}).get('Permission', [])
+            permissions = self.profile.fetch_rules(security_group_id)
             
             # 清空现有规则
             self.rules_table.setRowCount(0)
@@ -410,164 +1164,248 @@ class NetworkUpdater(QMainWindow):
             self.update_status(f"获取安全组规则失败: {str(e)}")
 
     def update_security_group(self):
-        if not self.client:
+        # 定时检查，可以使用其他实例缓存的公网IP
+        self.sync_profiles(list(self.profiles.values()))
+
+    def force_update_security_group(self):
+        # 手动更新通常是网络刚切换过，重新查询公网IP
+        self.sync_profiles(list(self.profiles.values()), refresh_ip=True)
+
+    def sync_profiles(self, profiles, refresh_ip=False):
+        """查询一次公网IP，然后并发更新各配置的安全组规则
+
+        refresh_ip 为 False 时优先使用本机其他实例缓存的公网IP。
+        """
+        # 记录当前界面选择的安全组和端口
+        self.save_settings()
+        
+        profiles = [p for p in profiles if p.client]
+        if not profiles:
             self.update_status("请先配置凭证")
             QMessageBox.warning(self, "警告", "请先配置凭证")
             return
             
-        try:
-            # 如果存在旧规则，先删除
-            if self.current_rule:
-                self.revoke_security_group()
+        targets = [p for p in profiles if p.security_group_id]
+        skipped = [self.profile_message(p, "请选择一个安全组") for p in profiles if not p.security_group_id]
+        if not targets:
+            self.update_status("请选择一个安全组")
+            QMessageBox.warning(self, "警告", "请选择一个安全组")
+            return
             
-            # 获取当前公网IP
-            current_ip = self.get_public_ip()
-            if not current_ip:
-                return
-                
-            # 创建新规则
-            request = AuthorizeSecurityGroupRequest()
-            request.set_accept_format('json')
-            
-            security_group_id = self.get_selected_security_group_id()
-            if not security_group_id:
-                self.update_status("请选择一个安全组")
-                QMessageBox.warning(self, "警告", "请选择一个安全组")
-                return
-                
-            request.set_SecurityGroupId(security_group_id)
-            request.set_IpProtocol("tcp")
-            request.set_PortRange(f"{self.port_input.value()}/{self.port_input.value()}")
-            request.set_SourceCidrIp(f"{current_ip}/32")
-            request.set_Description("由 NetworkUpdater 添加")
-            
-            response = self.client.do_action_with_exception(request)
-            self.current_rule = {
-                'ip': current_ip,
-                'port': self.port_input.value(),
-                'security_group_id': security_group_id
-            }
+        # 获取当前公网IP
+        tick_start = time.monotonic()
+        current_ip = self.ip_cache.get(self.get_public_ip, refresh=refresh_ip)
+        if self.recorder:
+            self.recorder.record_sync(tick_start, current_ip, targets)
+        if not current_ip:
+            # 释放缓存锁之后再提示，避免其他实例等待对话框关闭
+            self.update_status("从所有可用API获取公网IP失败")
+            QMessageBox.critical(self, "错误", "从所有可用API获取公网IP失败")
+            return
             
-            success_message = f"更新成功。当前IP: {current_ip}"
-            self.update_status(success_message)
-            if self.tray_icon:
-                self.tray_icon.showMessage(
-                    "安全组更新器",
-                    success_message,
-                    QSystemTrayIcon.MessageIcon.Information,
-                    2000
-                )
+        messages = []
+        errors = []
+        for profile, e in sync_concurrently(targets, current_ip):
+            if profile.revoke_error:
+                errors.append(self.profile_message(profile, f"撤销安全组规则失败: {str(profile.revoke_error)}"))
+            if e is None:
+                messages.append(self.profile_message(profile, f"更新成功。当前IP: {current_ip}"))
+                self.start_probe(profile)
+            else:
+                if is_throttled(e):
+                    errors.append(self.profile_message(profile, f"请求被限流，请稍后重试: {str(e)}"))
+                else:
+                    errors.append(self.profile_message(profile, f"更新安全组规则失败: {str(e)}"))
+                    
+        self.update_status("\n".join(messages + errors + skipped))
+        self.update_stats()
+        if messages and self.tray_icon:
+            self.tray_icon.showMessage(
+                "安全组更新器",
+                "\n".join(messages),
+                QSystemTrayIcon.MessageIcon.Information,
+                2000
+            )
             
-            # 刷新规则列表
+        # 刷新规则列表
+        if self.profile in targets:
             self.refresh_security_rules()
             
-        except Exception as e:
-            error_message = f"更新安全组规则失败: {str(e)}"
-            self.update_status(error_message)
-            QMessageBox.critical(self, "错误", error_message)
+        if errors:
+            QMessageBox.critical(self, "错误", "\n".join(errors))
 
-    def revoke_security_group(self):
-        if not self.current_rule:
+    def start_probe(self, profile):
+        """在后台线程中检测规则是否已生效，结果通过 probe_finished 信号返回"""
+        if not profile.probe_host:
             return
             
-        try:
-            request = RevokeSecurityGroupRequest()
-            request.set_accept_format('json')
-            request.set_SecurityGroupId(self.current_rule['security_group_id'])
-            request.set_IpProtocol("tcp")
-            request.set_PortRange(f"{self.current_rule['port']}/{self.current_rule['port']}")
-            request.set_SourceCidrIp(f"{self.current_rule['ip']}/32")
+        host, port, authorized_at = profile.probe_host, profile.port, profile.authorized_at
+        
+        def run():
+            # 任何异常都要返回结果，否则界面永远收不到检测结论
+            try:
+                if probe_port(host, port):
+                    self.probe_finished.emit(profile.name, authorized_at, time.monotonic() - authorized_at, '')
+                else:
+                    self.probe_finished.emit(profile.name, authorized_at, None, '')
+            except socket.gaierror as e:
+                self.probe_finished.emit(profile.name, authorized_at, None, f"无法解析主机 {host}: {str(e)}")
+            except Exception as e:
+                self.probe_finished.emit(profile.name, authorized_at, None, f"检测端口失败: {str(e)}")
+                
+        # 守护线程不会阻塞界面，也不会拖慢程序退出
+        threading.Thread(target=run, daemon=True).start()
+
+    def on_probe_finished(self, profile_name, authorized_at, seconds, error):
+        profile = self.profiles.get(profile_name)
+        # 之后又更新过规则时，旧的检测结果不再有效
+        if not profile or profile.authorized_at != authorized_at:
+            return
             
-            self.client.do_action_with_exception(request)
-            self.current_rule = None
+        if seconds is None:
+            profile.stats['probe_failures'] += 1
+            profile.stats['last_open_ms'] = None
+            message = error or f"端口 {profile.port} 在 {PROBE_TIMEOUT} 秒内仍无法访问"
+        else:
+            profile.stats['last_open_ms'] = int(seconds * 1000)
+            message = f"端口 {profile.port} 已可访问，规则生效耗时 {seconds:.1f} 秒"
+        if self.recorder:
+            self.recorder.record_probe(profile.name, profile.probe_host, profile.port, seconds, error)
+        self.update_status(self.profile_message(profile, message))
+        if profile is self.profile:
+            self.update_stats()
+
+    def revoke_security_group(self, profile=None):
+        """撤销配置添加的规则，返回规则是否已不存在"""
+        profile = profile or self.profile
+        if not profile.current_rule:
+            return True
+            
+        try:
+            profile.revoke()
             
             # 刷新规则列表
-            self.refresh_security_rules()
+            if profile is self.profile:
+                self.refresh_security_rules()
+            return True
             
         except Exception as e:
-            QMessageBox.critical(self, "错误", f"撤销安全组规则失败: {str(e)}")
+            QMessageBox.critical(self, "错误", self.profile_message(profile, f"撤销安全组规则失败: {str(e)}"))
+            return False
 
     def get_selected_security_group_id(self):
         return self.sg_combo.currentData()
 
     def save_settings(self):
+        profile = self.profile
+        profile.port = self.port_input.value()
+        profile.probe_host = self.probe_host_input.text().strip()
+        security_group_id = self.get_selected_security_group_id()
+        if security_group_id:
+            profile.security_group_id = security_group_id
         try:
-            settings = {
-                'auto_delete': self.auto_delete,
-                'auto_update': self.auto_update,
-                'port': self.port_input.value()
-            }
-            keyring.set_password("network_updater", "settings", 
-                               json.dumps(settings))
+            keyring.set_password(KEYRING_SERVICE, profile_key(profile.name, "settings"), 
+                               json.dumps(profile.to_settings()))
         except Exception:
             pass  # 设置保存失败不影响主要功能
 
     def load_settings(self):
-        try:
-            settings = keyring.get_password("network_updater", "settings")
-            if settings:
-                settings = json.loads(settings)
-                self.auto_delete = settings.get('auto_delete', True)
-                self.auto_update = settings.get('auto_update', True)
-                self.auto_delete_cb.setChecked(self.auto_delete)
-                self.auto_update_cb.setChecked(self.auto_update)
-                self.port_input.setValue(settings.get('port', 8223))
-        except Exception:
-            pass  # 设置加载失败使用默认值
-
-    def get_public_ip(self):
-        # IP检测接口列表，按优先级排序
-        ip_apis = [
-            {
-                'url': 'https://myip.ipip.net/json',
-                'parser': lambda r: r.json()['data']['ip']
-            },
-            {
-                'url': 'https://myip.ipip.net/',
-                'parser': lambda r: r.text.split('IP：')[1].split(' ')[0]
-            },
-            {
-                'url': 'http://ip.3322.net',
-                'parser': lambda r: r.text.strip()
-            },
-            {
-                'url': 'https://api.ipify.org?format=json',
-                'parser': lambda r: r.json()['ip']
-            }
-        ]
-
-        for api in ip_apis:
+        for profile in self.profiles.values():
             try:
-                response = requests.get(api['url'], timeout=5)
-                if response.status_code == 200:
-                    ip = api['parser'](response)
-                    if ip and self.is_valid_ip(ip):
-                        return ip
+                settings = keyring.get_password(KEYRING_SERVICE, profile_key(profile.name, "settings"))
+                if settings:
+                    profile.load_settings(json.loads(settings))
             except Exception:
-                continue
+                pass  # 设置加载失败使用默认值
+        self.apply_profile()
 
-        QMessageBox.critical(self, "错误", "从所有可用API获取公网IP失败")
-        return None
+    def get_public_ip(self):
+        http_get = self.recorder.http_get if self.recorder else None
+        return resolve_public_ip(http_get)
 
     def is_valid_ip(self, ip):
-        try:
-            # 简单的IP地址格式验证
-            parts = ip.split('.')
-            return len(parts) == 4 and all(0 <= int(part) <= 255 for part in parts)
-        except (AttributeError, TypeError, ValueError):
-            return False
+        return is_valid_ip(ip)
 
     def show_config_dialog(self):
-        dialog = ConfigDialog(self)
+        dialog = ConfigDialog(self, self.active_profile)
+        if dialog.exec() == QDialog.DialogCode.Accepted:
+            self.init_profile_client()
+
+    def show_new_profile_dialog(self):
+        dialog = ConfigDialog(self, None)
         if dialog.exec() == QDialog.DialogCode.Accepted:
-            self.init_client()
+            self.save_settings()
+            self.profiles[dialog.profile_name] = Profile(dialog.profile_name, self.recorder)
+            self.active_profile = dialog.profile_name
+            self.populate_profiles()
+            self.rules_table.setRowCount(0)
+            self.apply_profile()
+            self.init_profile_client()
+
+    def init_profile_client(self):
+        try:
+            self.profile.init_client()
+            if self.client:
+                self.refresh_security_groups()
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"初始化客户端失败: {str(e)}")
+
+    def delete_profile(self):
+        profile = self.profile
+        if profile.name == DEFAULT_PROFILE:
+            QMessageBox.warning(self, "警告", "默认配置不能删除")
+            return
+            
+        reply = QMessageBox.question(
+            self,
+            "确认删除",
+            f"是否确认删除配置 {profile.name}？该配置添加的安全组规则将被删除。",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+            QMessageBox.StandardButton.No
+        )
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+            
+        # 规则撤销失败时保留凭证，否则之后无法再删除该规则
+        if not self.revoke_security_group(profile):
+            return
+        for key in ("credentials", "access_secret", "settings"):
+            try:
+                keyring.delete_password(KEYRING_SERVICE, profile_key(profile.name, key))
+            except Exception:
+                pass  # 条目不存在时忽略
+                
+        del self.profiles[profile.name]
+        try:
+            save_profile_names(list(self.profiles))
+        except Exception as e:
+            QMessageBox.warning(self, "警告", f"保存配置列表失败: {str(e)}")
+            
+        self.active_profile = DEFAULT_PROFILE
+        self.populate_profiles()
+        self.rules_table.setRowCount(0)
+        self.apply_profile()
+        self.refresh_security_rules()
 
     def cleanup(self):
-        if self.auto_delete and self.current_rule:
-            self.revoke_security_group()
+        for profile in self.profiles.values():
+            if profile.auto_delete and profile.current_rule:
+                self.revoke_security_group(profile)
+        if self.recorder:
+            self.recorder.close()
 
 if __name__ == '__main__':
-    app = QApplication(sys.argv)
-    window = NetworkUpdater()
+    parser = argparse.ArgumentParser(description="安全组更新器")
+    parser.add_argument('--record', metavar='PATH', help="将阿里云API和IP检测接口的请求记录到文件")
+    parser.add_argument('--replay', metavar='PATH', help="不启动界面，按录制文件回放同步过程")
+    parser.add_argument('--speed', type=float, default=1.0, help="回放倍速，0 表示不等待（默认 1）")
+    args, qt_args = parser.parse_known_args()
+    
+    if args.replay:
+        replay_traffic(args.replay, args.speed)
+        sys.exit(0)
+        
+    app = QApplication(sys.argv[:1] + qt_args)
+    window = NetworkUpdater(TrafficRecorder(args.record) if args.record else None)
     window.show()
     sys.exit(app.exec())
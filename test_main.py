@@ -1,24 +1,37 @@
+import os
+import gzip
+import time
+import errno
+import json
+import socket
+import tempfile
+import threading
 import unittest
 from unittest.mock import MagicMock, patch
-import json
 import keyring
 from PySide6.QtWidgets import QApplication
-from main import NetworkUpdater, ConfigDialog
+from aliyunsdkcore.acs_exception.exceptions import ServerException
+from main import (NetworkUpdater, ConfigDialog, Profile, SharedIpCache, TrafficRecorder,
+                  profile_key, probe_port, resolve_public_ip, sync_concurrently, replay_traffic)
 
 class TestNetworkUpdater(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
         # 创建QApplication实例
-        cls.app = QApplication([])
+        cls.app = QApplication.instance() or QApplication([])
         
     def setUp(self):
         # 每个测试用例开始前创建NetworkUpdater实例
         self.updater = NetworkUpdater()
+        # 使用临时目录中的IP缓存，避免读写本机真实缓存
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.updater.ip_cache = SharedIpCache(os.path.join(self.cache_dir.name, 'ip.json'))
         
     def tearDown(self):
         # 每个测试用例结束后清理
         if hasattr(self, 'updater'):
             self.updater.cleanup()
+        self.cache_dir.cleanup()
             
     def test_init(self):
         """测试初始化状态"""
@@ -28,8 +41,9 @@ class TestNetworkUpdater(unittest.TestCase):
         self.assertTrue(self.updater.auto_update)
         self.assertIsNotNone(self.updater.tray_icon)
         
+    @patch('main.QMessageBox')
     @patch('requests.get')
-    def test_get_public_ip(self, mock_get):
+    def test_get_public_ip(self, mock_get, mock_message_box):
         """测试获取公网IP"""
         # 模拟ipip.net的响应
         mock_get.return_value.status_code = 200
@@ -87,8 +101,9 @@ class TestNetworkUpdater(unittest.TestCase):
         self.updater.save_settings()
         mock_set.assert_called_once()
         
+    @patch('main.QMessageBox')
     @patch('aliyunsdkcore.client.AcsClient')
-    def test_security_group_operations(self, mock_client):
+    def test_security_group_operations(self, mock_client, mock_message_box):
         """测试安全组操作"""
         # 模拟阿里云客户端
         mock_client_instance = MagicMock()
@@ -110,20 +125,343 @@ class TestNetworkUpdater(unittest.TestCase):
         # 初始化客户端
         self.updater.client = mock_client_instance
         
-        # 测试刷新安全组列表
-        self.updater.refresh_security_groups()
-        self.assertEqual(self.updater.sg_combo.count(), 1)
-        
-        # 测试更新安全组规则
+        # 刷新安全组列表时会自动更新规则，需在此之前模拟公网IP
         with patch.object(self.updater, 'get_public_ip', return_value='1.2.3.4'):
+            # 测试刷新安全组列表
+            self.updater.refresh_security_groups()
+            self.assertEqual(self.updater.sg_combo.count(), 1)
+            
+            # 测试更新安全组规则
             self.updater.update_security_group()
             # 验证是否调用了阿里云API
             self.assertTrue(mock_client_instance.do_action_with_exception.called)
             
+    def test_manual_update_refreshes_ip(self):
+        """测试手动更新重新查询公网IP，定时检查使用缓存"""
+        with patch.object(self.updater, 'sync_profiles') as mock_sync:
+            self.updater.update_btn.click()
+            self.assertTrue(mock_sync.call_args.kwargs['refresh_ip'])
+            self.updater.timer.timeout.emit()
+            self.assertNotIn('refresh_ip', mock_sync.call_args.kwargs)
+            
+    def test_profile_key(self):
+        """测试配置在密钥库中的键名"""
+        self.assertEqual(profile_key('default', 'credentials'), 'credentials')
+        self.assertEqual(profile_key('prod', 'credentials'), 'credentials:prod')
+        
+    @patch('main.QMessageBox')
+    def test_sync_multiple_profiles(self, mock_message_box):
+        """测试多个配置共用一次IP查询并分别报告失败"""
+        ok_profile = self.updater.profile
+        ok_profile.client = MagicMock()
+        ok_profile.security_group_id = 'sg-1'
+        
+        throttled_profile = Profile('prod')
+        throttled_profile.client = MagicMock()
+        throttled_profile.client.do_action_with_exception.side_effect = ServerException(
+            'Throttling.User', 'Request was denied due to user flow control.')
+        throttled_profile.security_group_id = 'sg-2'
+        self.updater.profiles['prod'] = throttled_profile
+        self.updater.populate_profiles()
+        
+        with patch.object(self.updater, 'get_public_ip', return_value='1.2.3.4') as mock_ip:
+            self.updater.update_security_group()
+            mock_ip.assert_called_once()
+            
+        self.assertEqual(ok_profile.current_rule['ip'], '1.2.3.4')
+        self.assertEqual(ok_profile.stats['failures'], 0)
+        self.assertIsNone(throttled_profile.current_rule)
+        self.assertEqual(throttled_profile.stats['failures'], 1)
+        self.assertEqual(throttled_profile.stats['throttled'], 1)
+        self.assertIn('[prod] 请求被限流', self.updater.status_label.text())
+        self.assertIn('[default] 更新成功', self.updater.status_label.text())
+        self.assertIn('同步 1 次，失败 0 次', self.updater.stats_label.text())
+        
+        # 切换配置后显示该配置的统计
+        self.updater.profile_combo.setCurrentText('prod')
+        self.assertIn('失败 1 次，限流 1 次', self.updater.stats_label.text())
+        
+    @patch('main.QMessageBox')
+    def test_revoke_failure_still_authorizes(self, mock_message_box):
+        """测试撤销旧规则失败时仍然添加新规则"""
+        profile = self.updater.profile
+        profile.client = MagicMock()
+        profile.client.do_action_with_exception.side_effect = [
+            ServerException('Throttling.User', 'Request was denied due to user flow control.'), b'{}']
+        profile.security_group_id = 'sg-1'
+        profile.current_rule = {'ip': '5.6.7.8', 'port': 8223, 'security_group_id': 'sg-1'}
+        
+        with patch.object(self.updater, 'get_public_ip', return_value='1.2.3.4'):
+            self.updater.update_security_group()
+            
+        self.assertEqual(profile.current_rule['ip'], '1.2.3.4')
+        self.assertEqual(profile.stats['revoke_failures'], 1)
+        self.assertEqual(profile.stats['failures'], 0)
+        self.assertIn('撤销安全组规则失败', self.updater.status_label.text())
+        # 避免 tearDown 再次撤销
+        profile.current_rule = None
+        
+    @patch('keyring.delete_password')
+    @patch('main.QMessageBox')
+    def test_delete_profile_keeps_credentials_on_revoke_failure(self, mock_message_box, mock_delete):
+        """测试撤销规则失败时不删除配置"""
+        mock_message_box.question.return_value = mock_message_box.StandardButton.Yes
+        profile = Profile('prod')
+        profile.client = MagicMock()
+        profile.client.do_action_with_exception.side_effect = Exception("Connection error")
+        profile.current_rule = {'ip': '1.2.3.4', 'port': 8223, 'security_group_id': 'sg-1'}
+        self.updater.profiles['prod'] = profile
+        self.updater.active_profile = 'prod'
+        
+        self.updater.delete_profile()
+        
+        self.assertIn('prod', self.updater.profiles)
+        mock_delete.assert_not_called()
+        # 避免 tearDown 再次撤销
+        profile.current_rule = None
+        
+    def test_probe_after_update(self):
+        """测试更新后在后台检测端口并记录生效耗时"""
+        with socket.socket() as server:
+            server.bind(('127.0.0.1', 0))
+            server.listen()
+            profile = self.updater.profile
+            profile.probe_host = '127.0.0.1'
+            profile.port = server.getsockname()[1]
+            profile.authorized_at = time.monotonic()
+            
+            self.updater.start_probe(profile)
+            deadline = time.monotonic() + 5
+            while profile.stats['last_open_ms'] is None and time.monotonic() < deadline:
+                self.app.processEvents()
+                time.sleep(0.01)
+                
+        self.assertIsNotNone(profile.stats['last_open_ms'])
+        self.assertIn('已可访问', self.updater.status_label.text())
+        self.assertIn('上次规则生效耗时', self.updater.stats_label.text())
+        
+    def wait_for_probe(self, profile):
+        deadline = time.monotonic() + 5
+        while not profile.stats['probe_failures'] and time.monotonic() < deadline:
+            self.app.processEvents()
+            time.sleep(0.01)
+            
+    def test_probe_failure(self):
+        """测试端口始终无法访问时记录失败，并写入录制文件"""
+        path = os.path.join(self.cache_dir.name, 'traffic.jsonl.gz')
+        self.updater.recorder = TrafficRecorder(path)
+        profile = self.updater.profile
+        profile.probe_host = '127.0.0.1'
+        profile.authorized_at = 1.0
+        
+        self.updater.on_probe_finished('default', 1.0, None, '')
+        self.updater.recorder.close()
+        self.updater.recorder = None
+        
+        self.assertEqual(profile.stats['probe_failures'], 1)
+        self.assertIn('仍无法访问', self.updater.status_label.text())
+        self.assertIn('端口检测失败 1 次', self.updater.stats_label.text())
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            event = json.loads(f.readline())
+        self.assertEqual(event['kind'], 'probe')
+        self.assertIsNone(event['seconds'])
+        
+    def test_stale_probe_ignored(self):
+        """测试规则再次更新后忽略旧的检测结果"""
+        profile = self.updater.profile
+        profile.authorized_at = 2.0
+        self.updater.on_probe_finished('default', 1.0, 30.0, '')
+        self.assertIsNone(profile.stats['last_open_ms'])
+        self.assertEqual(profile.stats['probe_failures'], 0)
+        
+    @patch('main.probe_port')
+    def test_probe_errors_reported(self, mock_probe):
+        """测试检测线程出错或主机无法解析时仍然返回结果"""
+        profile = self.updater.profile
+        profile.probe_host = 'example.invalid'
+        profile.authorized_at = time.monotonic()
+        
+        for error, message in ((OSError(errno.EMFILE, 'Too many open files'), '检测端口失败'),
+                               (socket.gaierror('Name or service not known'), '无法解析主机')):
+            profile.stats['probe_failures'] = 0
+            mock_probe.side_effect = error
+            self.updater.start_probe(profile)
+            self.wait_for_probe(profile)
+            self.assertEqual(profile.stats['probe_failures'], 1)
+            self.assertIn(message, self.updater.status_label.text())
+        
+class TestProbePort(unittest.TestCase):
+    def test_open_port(self):
+        """测试端口可访问"""
+        with socket.socket() as server:
+            server.bind(('127.0.0.1', 0))
+            server.listen()
+            self.assertTrue(probe_port('127.0.0.1', server.getsockname()[1], timeout=2))
+            
+    @patch('socket.getaddrinfo')
+    def test_ipv4_only(self, mock_getaddrinfo):
+        """测试只通过IPv4检测"""
+        mock_getaddrinfo.side_effect = socket.gaierror('Name or service not known')
+        with self.assertRaises(socket.gaierror):
+            probe_port('example.invalid', 22, timeout=1)
+        self.assertEqual(mock_getaddrinfo.call_args.kwargs['family'], socket.AF_INET)
+        
+    def test_closed_port(self):
+        """测试端口不可访问时在超时后返回"""
+        with socket.socket() as server:
+            server.bind(('127.0.0.1', 0))
+            port = server.getsockname()[1]
+        start = time.monotonic()
+        self.assertFalse(probe_port('127.0.0.1', port, timeout=0.5, initial_delay=0.1))
+        self.assertLess(time.monotonic() - start, 2)
+        
+class TestSharedIpCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.cache_dir.name, 'ip.json')
+        
+    def tearDown(self):
+        self.cache_dir.cleanup()
+        
+    def test_reuse_cached_ip(self):
+        """测试多个实例复用同一缓存"""
+        resolver = MagicMock(return_value='1.2.3.4')
+        self.assertEqual(SharedIpCache(self.path).get(resolver), '1.2.3.4')
+        self.assertEqual(SharedIpCache(self.path).get(resolver), '1.2.3.4')
+        resolver.assert_called_once()
+        
+    def test_expired_cache(self):
+        """测试缓存过期后重新查询，查询失败不写入缓存"""
+        cache = SharedIpCache(self.path, ttl=0)
+        resolver = MagicMock(side_effect=['1.2.3.4', None])
+        self.assertEqual(cache.get(resolver), '1.2.3.4')
+        self.assertIsNone(cache.get(resolver))
+        self.assertEqual(resolver.call_count, 2)
+        
+    def test_forced_refresh(self):
+        """测试强制刷新时忽略未过期的缓存并写回新结果"""
+        cache = SharedIpCache(self.path)
+        self.assertEqual(cache.get(lambda: '1.2.3.4'), '1.2.3.4')
+        self.assertEqual(cache.get(lambda: '5.6.7.8', refresh=True), '5.6.7.8')
+        self.assertEqual(cache.read(), '5.6.7.8')
+        
+    def test_reject_invalid_entry(self):
+        """测试拒绝无效IP和时间戳在未来的缓存"""
+        cache = SharedIpCache(self.path)
+        for entry in ({'ip': '6.6.6.6/0 x', 'timestamp': time.time()},
+                      {'ip': '6.6.6.6', 'timestamp': time.time() + 1e9}):
+            with open(self.path, 'w') as f:
+                json.dump(entry, f)
+            self.assertIsNone(cache.read())
+            self.assertEqual(cache.get(lambda: '1.2.3.4'), '1.2.3.4')
+            
+    @unittest.skipUnless(hasattr(os, 'getuid'), "需要 POSIX 权限")
+    def test_shared_directory_not_used(self):
+        """测试其他用户可写的缓存目录不被使用"""
+        directory = os.path.join(self.cache_dir.name, 'shared')
+        os.mkdir(directory)
+        os.chmod(directory, 0o777)
+        path = os.path.join(directory, 'ip.json')
+        with open(path, 'w') as f:
+            json.dump({'ip': '6.6.6.6', 'timestamp': time.time()}, f)
+            
+        resolver = MagicMock(return_value='1.2.3.4')
+        self.assertEqual(SharedIpCache(path).get(resolver), '1.2.3.4')
+        resolver.assert_called_once()
+        
+    def test_single_leader(self):
+        """测试并发读取时只有一个实例查询"""
+        calls = []
+        
+        def resolver():
+            calls.append(1)
+            time.sleep(0.2)
+            return '1.2.3.4'
+            
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(SharedIpCache(self.path).get(resolver)))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+            
+        self.assertEqual(results, ['1.2.3.4'] * 4)
+        self.assertEqual(len(calls), 1)
+        
+class TestRecordReplay(unittest.TestCase):
+    def setUp(self):
+        self.log_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.log_dir.name, 'traffic.jsonl.gz')
+        
+    def tearDown(self):
+        self.log_dir.cleanup()
+        
+    @patch('requests.get')
+    def test_record_and_replay(self, mock_get):
+        """测试录制的同步过程可以离线回放"""
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.text = json.dumps({'data': {'ip': '1.2.3.4'}})
+        mock_get.return_value.json.return_value = {'data': {'ip': '1.2.3.4'}}
+        
+        recorder = TrafficRecorder(self.path)
+        profile = Profile('default', recorder)
+        profile.client = MagicMock()
+        profile.client.do_action_with_exception.side_effect = [
+            b'{}', ServerException('Throttling.User', 'Request was denied due to user flow control.'), b'{}']
+        profile.security_group_id = 'sg-1'
+        
+        # 第一次同步添加规则，第二次撤销旧规则时被限流，仍然添加新规则
+        for _ in range(2):
+            start = time.monotonic()
+            current_ip = resolve_public_ip(recorder.http_get)
+            recorder.record_sync(start, current_ip, [profile])
+            sync_concurrently([profile], current_ip)
+        recorder.close()
+        
+        output = []
+        durations = replay_traffic(self.path, speed=0, output=output.append)
+        
+        self.assertEqual(len(durations), 2)
+        self.assertIn('IP 1.2.3.4', output[0])
+        self.assertIn('成功', output[1])
+        self.assertIn('成功', output[3])
+        self.assertIn('Throttling.User', output[3])
+        
+    def test_replay_truncated_recording(self):
+        """测试录制未正常结束时仍可回放已写入的事件"""
+        recorder = TrafficRecorder(self.path)
+        profile = Profile('default', recorder)
+        profile.client = MagicMock()
+        profile.client.do_action_with_exception.return_value = b'{}'
+        profile.security_group_id = 'sg-1'
+        recorder.record_sync(time.monotonic(), '1.2.3.4', [profile])
+        sync_concurrently([profile], '1.2.3.4')
+        complete_size = os.path.getsize(self.path)
+        recorder.record_sync(time.monotonic(), '1.2.3.4', [profile])
+        
+        recorder.close()
+        with open(self.path, 'rb') as f:
+            data = f.read()
+            
+        # 模拟程序被强制结束：在最后一个事件的每个字节处截断
+        for size in range(complete_size + 1, len(data)):
+            with self.subTest(size=size):
+                with open(self.path, 'wb') as f:
+                    f.write(data[:size])
+                    
+                output = []
+                durations = replay_traffic(self.path, speed=0, output=output.append)
+                
+                self.assertIn('录制文件不完整', output[0])
+                self.assertIn('成功', output[2])
+                # 只截掉 gzip 尾部校验时最后一个事件仍然完整
+                self.assertIn(len(durations), (1, 2))
+        
 class TestConfigDialog(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
-        cls.app = QApplication([])
+        cls.app = QApplication.instance() or QApplication([])
         
     def setUp(self):
         self.dialog = ConfigDialog()
@@ -142,8 +480,10 @@ class TestConfigDialog(unittest.TestCase):
         self.assertEqual(self.dialog.key_input.text(), 'test_key')
         self.assertEqual(self.dialog.region_input.text(), 'cn-hangzhou')
         
+    @patch('main.QMessageBox')
+    @patch('keyring.get_password', return_value=None)
     @patch('keyring.set_password')
-    def test_save_credentials(self, mock_set):
+    def test_save_credentials(self, mock_set, mock_get, mock_message_box):
         """测试凭证保存"""
         # 设置测试数据
         self.dialog.key_input.setText('test_key')